@@ -0,0 +1,92 @@
+from typing import Any, Dict, Callable, Awaitable
+from genome import DefaultGenome
+import asyncio
+
+
+async def evaluate_genomes_async(genomes: Dict[Any, DefaultGenome],
+                                 fitness_function: Callable[[DefaultGenome], Awaitable[float]],
+                                 max_concurrency: int = 100,
+                                 timeout: float = None,
+                                 timeout_fitness: float = None) -> Dict[Any, float]:
+    # fitness_function is an "async def fitness(genome)" coroutine function
+    # at most max_concurrency evaluations are in flight, evaluations running longer than timeout get timeout_fitness
+    assert max_concurrency > 0, 'max_concurrency must be greater than 0'
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def evaluate(genome: DefaultGenome) -> None:
+        async with semaphore:
+            try:
+                fitness = await asyncio.wait_for(fitness_function(genome), timeout)
+            except asyncio.TimeoutError:
+                fitness = timeout_fitness
+        genome.fitness = None if fitness is None else float(fitness)
+
+    tasks = [asyncio.ensure_future(evaluate(g)) for g in genomes.values()]
+    if len(tasks) == 0:
+        return {}
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for t in done:
+            if t.exception() is not None:
+                raise t.exception()
+    finally:
+        # on error or when the caller is cancelled, do not leave evaluations running in the background
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return {gk: g.fitness for gk, g in genomes.items()}
+
+
+def evaluate_genomes(genomes: Dict[Any, DefaultGenome],
+                     fitness_function: Callable[[DefaultGenome], Awaitable[float]],
+                     max_concurrency: int = 100,
+                     timeout: float = None,
+                     timeout_fitness: float = None) -> Dict[Any, float]:
+    return asyncio.run(evaluate_genomes_async(genomes, fitness_function, max_concurrency, timeout, timeout_fitness))
+
+
+if __name__ == '__main__':
+    from genes import NeuralNodeGene, NeuralConnectionGene
+    from collections import namedtuple
+    import activation_functions
+    import aggregation_functions
+    import sys
+    import time
+    y = {
+        'node_gene_type': NeuralNodeGene,
+        'connection_gene_type': NeuralConnectionGene,
+        'input_keys': [-1, -2],
+        'output_keys': [0],
+        'weight_init_type': 'normal', 'weight_mean': 0.0, 'weight_stdev': 1.0, 'weight_max_value': 2.0, 'weight_min_value': -2.0,
+        'response_init_type': 'normal', 'response_mean': 0.0, 'response_stdev': 1.0, 'response_max_value': 2.0, 'response_min_value': -2.0,
+        'bias_init_type': 'normal', 'bias_mean': 0.0, 'bias_stdev': 1.0, 'bias_max_value': 2.0, 'bias_min_value': -2.0,
+        'activation_function_def': {'sigmoid': activation_functions.SigmoidActivationFunction},
+        'aggregation_function_def': {'sum': aggregation_functions.SumAggregationFunction}
+    }
+    yp = namedtuple('config', y.keys())(*y.values())
+
+    # dummy simulator: reads a number from the pipe, waits, answers with a score
+    simulator = 'import sys, time; x = float(sys.stdin.readline()); time.sleep(0.2 + 0.3 * (abs(x) % 1)); print(-abs(x))'
+
+    async def fitness(genome: DefaultGenome) -> float:
+        proc = await asyncio.create_subprocess_exec(sys.executable, '-c', simulator, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        try:
+            x = sum(ng.bias for ng in genome.nodes.values())
+            out, _ = await proc.communicate('{0}\n'.format(x).encode())
+            return float(out)
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+    population = {}
+    for i in range(200):
+        g = DefaultGenome(i)
+        g.configure_new(yp)
+        population[i] = g
+    t = time.perf_counter()
+    evaluate_genomes(population, fitness, max_concurrency=100, timeout=5., timeout_fitness=-10.)
+    print('evaluated {0} genomes in {1:.2f}s'.format(len(population), time.perf_counter() - t))
+    print(sum(g.fitness == -10. for g in population.values()), 'timed out')
+    print(max(g.fitness for g in population.values()))
@@ -2,6 +2,7 @@ import random
 from typing import Any
 from abc import ABC, abstractmethod
 from utils import clamp, without_keys
+from registry import get_function_registry
 import copy
 
 
@@ -38,6 +39,12 @@ class BaseAttr(ABC):
     def init_value(self, config: object) -> Any:
         pass
 
+    def serialize_value(self, value: Any, config: object) -> Any:
+        return value
+
+    def deserialize_value(self, value: Any, config: object) -> Any:
+        return value
+
     @abstractmethod
     def mutate_value(self, value: Any, config: object) -> Any:
         pass
@@ -159,6 +166,28 @@ class StringAttr(BaseAttr):
         return value
 
 
+class CodedStringAttr(StringAttr):
+    # string attribute stored as the integer code of the name in config.<function_def_name>
+    def __init__(self, name: str, function_def_name: str, **default_dict):
+        super(CodedStringAttr, self).__init__(name, **default_dict)
+        self.function_def_name = function_def_name
+
+    def init_value(self, config: object) -> int:
+        registry = get_function_registry(config, self.function_def_name)
+        return registry.code(super(CodedStringAttr, self).init_value(config))
+
+    def mutate_value(self, value: int, config: object) -> int:
+        registry = get_function_registry(config, self.function_def_name)
+        return registry.code(super(CodedStringAttr, self).mutate_value(registry.name(value), config))
+
+    def serialize_value(self, value: int, config: object) -> str:
+        # codes depend on the order of the def, names do not
+        return get_function_registry(config, self.function_def_name).name(value)
+
+    def deserialize_value(self, value: str, config: object) -> int:
+        return get_function_registry(config, self.function_def_name).code(value)
+
+
 if __name__ == '__main__':
     x = FloatAttr('weight', default_value=43.435)
     y = {
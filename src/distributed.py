@@ -0,0 +1,285 @@
+from typing import Any, Dict, List, Tuple, Callable, Deque
+from multiprocessing.connection import Listener, Client, Connection, wait
+from collections import deque
+from genome import DefaultGenome
+from genes import NeuralNodeGene, NeuralConnectionGene
+from utils import clamp
+import activation_functions
+import aggregation_functions
+import threading
+import os
+import queue
+import json
+import time
+
+# wire protocol: every message is one JSON object sent with send_bytes
+#   coordinator -> worker: {"type": "batch", "id": int, "genomes": [DefaultGenome.serialize(config), ...]}
+#                          {"type": "stop"}
+#   worker -> coordinator: {"type": "result", "id": int, "fitness": [float, ...], "elapsed": float}
+#                          {"type": "error", "id": int, "error": str}  when the fitness function raised
+# genomes are shipped in their compact serialized form, never as pickled objects
+
+
+def _send(conn: Connection, message: Dict[str, Any]) -> None:
+    conn.send_bytes(json.dumps(message, separators=(',', ':')).encode())
+
+
+def _recv(conn: Connection) -> Dict[str, Any]:
+    return json.loads(conn.recv_bytes().decode())
+
+
+class _WorkerHandle(object):
+    def __init__(self, conn: Connection, batch_size: int):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.throughput: float = None  # genomes per second, exponential moving average
+        self.outstanding: Dict[int, List[Any]] = {}  # batch id -> genome keys
+
+
+class Coordinator(object):
+    def __init__(self, config: object, address: Tuple[str, int] = ('localhost', 0), authkey: bytes = b'neat',
+                 pipeline_depth: int = 2, initial_batch_size: int = 4, min_batch_size: int = 1, max_batch_size: int = 256,
+                 target_batch_time: float = 0.5, throughput_smoothing: float = 0.5, max_retries: int = 3):
+        assert pipeline_depth > 0, 'pipeline_depth must be greater than 0'
+        self.config = config
+        self.pipeline_depth = pipeline_depth
+        self.initial_batch_size = initial_batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_batch_time = target_batch_time
+        self.throughput_smoothing = throughput_smoothing
+        self.max_retries = max_retries  # a genome whose workers died more often than this aborts the evaluation
+        self.workers: List[_WorkerHandle] = []
+        self.retries: int = 0
+        self._next_batch_id: int = 0
+        self._listener = Listener(address, authkey=authkey)
+        self._closed = False
+        self._new_connections: queue.Queue = queue.Queue()
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._listener.address
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._closed:
+                    return
+                continue  # failed handshake, e.g. wrong authkey or the worker died while connecting
+            self._new_connections.put(conn)
+
+    def _add_new_workers(self) -> None:
+        while True:
+            try:
+                conn = self._new_connections.get_nowait()
+            except queue.Empty:
+                return
+            self.workers.append(_WorkerHandle(conn, self.initial_batch_size))
+
+    def _drop_worker(self, worker: _WorkerHandle, pending: Deque[Any], attempts: Dict[Any, int]) -> None:
+        # worker died: its unfinished batches go back to the front of the queue
+        for keys in worker.outstanding.values():
+            pending.extendleft(reversed(keys))
+            self.retries += 1
+            for gk in keys:
+                attempts[gk] = attempts.get(gk, 0) + 1
+        worker.outstanding.clear()
+        self.workers.remove(worker)
+        try:
+            worker.conn.close()
+        except OSError:
+            pass
+
+    def _fill_pipeline(self, worker: _WorkerHandle, genomes: Dict[Any, DefaultGenome], pending: Deque[Any]) -> None:
+        while (len(worker.outstanding) < self.pipeline_depth) and (len(pending) > 0):
+            keys = [pending.popleft() for _ in range(min(worker.batch_size, len(pending)))]
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+            worker.outstanding[batch_id] = keys
+            _send(worker.conn, {'type': 'batch', 'id': batch_id, 'genomes': [genomes[gk].serialize(self.config) for gk in keys]})
+
+    def _update_throughput(self, worker: _WorkerHandle, num_genomes: int, elapsed: float) -> None:
+        throughput = num_genomes / max(elapsed, 1e-6)
+        if worker.throughput is None:
+            worker.throughput = throughput
+        else:
+            worker.throughput = self.throughput_smoothing * throughput + (1. - self.throughput_smoothing) * worker.throughput
+        # faster workers get larger batches so every batch takes about target_batch_time
+        worker.batch_size = int(clamp(round(worker.throughput * self.target_batch_time), self.min_batch_size, self.max_batch_size))
+
+    def _abort(self, message: str) -> None:
+        # forget the batches still in flight, their late results are ignored by the next evaluate
+        for worker in self.workers:
+            worker.outstanding.clear()
+        raise RuntimeError('{0}: {1}'.format(self.__class__, message))
+
+    def evaluate(self, genomes: Dict[Any, DefaultGenome], timeout: float = None) -> Dict[Any, float]:
+        pending: Deque[Any] = deque(genomes.keys())
+        remaining = len(pending)
+        attempts: Dict[Any, int] = {}
+        start = time.perf_counter()
+        while remaining > 0:
+            if (timeout is not None) and (time.perf_counter() - start > timeout):
+                self._abort('{0} genomes not evaluated after {1}s'.format(remaining, timeout))
+            failed = [gk for gk, n in attempts.items() if n > self.max_retries]
+            if len(failed) > 0:
+                self._abort('workers died {0} times evaluating genomes {1}'.format(self.max_retries + 1, failed))
+            self._add_new_workers()
+            for worker in list(self.workers):
+                try:
+                    self._fill_pipeline(worker, genomes, pending)
+                except (OSError, EOFError):
+                    self._drop_worker(worker, pending, attempts)
+            if len(self.workers) == 0:
+                time.sleep(0.05)  # wait for a worker to connect
+                continue
+            ready = wait([w.conn for w in self.workers], timeout=0.1)
+            for worker in [w for w in self.workers if w.conn in ready]:
+                try:
+                    message = _recv(worker.conn)
+                except (OSError, EOFError):
+                    self._drop_worker(worker, pending, attempts)
+                    continue
+                keys = worker.outstanding.pop(message['id'], None)
+                if keys is None:
+                    continue  # batch of an aborted evaluate
+                if message['type'] == 'error':
+                    self._abort('fitness function failed on one of genomes {0}: {1}'.format(keys, message['error']))
+                for gk, fitness in zip(keys, message['fitness']):
+                    genomes[gk].fitness = None if fitness is None else float(fitness)
+                remaining -= len(keys)
+                self._update_throughput(worker, len(keys), message['elapsed'])
+        return {gk: g.fitness for gk, g in genomes.items()}
+
+    def close(self) -> None:
+        self._closed = True
+        self._listener.close()
+        self._add_new_workers()
+        for worker in self.workers:
+            try:
+                _send(worker.conn, {'type': 'stop'})
+                worker.conn.close()
+            except OSError:
+                pass
+        self.workers = []
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def run_worker(address: Tuple[str, int], config: object, fitness_function: Callable[[DefaultGenome], float],
+               authkey: bytes = b'neat') -> None:
+    # the fitness function is called with rebuilt DefaultGenome objects, same as in a single-process run
+    genome_type = getattr(config, 'genome_type', DefaultGenome)
+    conn = Client(address, authkey=authkey)
+    try:
+        while True:
+            try:
+                message = _recv(conn)
+            except (OSError, EOFError):
+                return  # coordinator went away
+            if message['type'] == 'stop':
+                return
+            elif message['type'] == 'batch':
+                start = time.perf_counter()
+                try:
+                    fitness = [fitness_function(genome_type.deserialize(data, config)) for data in message['genomes']]
+                except Exception as e:
+                    _send(conn, {'type': 'error', 'id': message['id'], 'error': repr(e)})
+                    continue
+                _send(conn, {'type': 'result', 'id': message['id'], 'fitness': fitness, 'elapsed': time.perf_counter() - start})
+            else:
+                raise RuntimeError('worker: message type {0} not recognized'.format(message['type']))
+    finally:
+        conn.close()
+
+
+def _demo_fitness(genome: DefaultGenome) -> float:
+    time.sleep(0.005)
+    return -sum(abs(cg.weight - 1.) for cg in genome.connections.values())
+
+
+def _demo_slow_fitness(genome: DefaultGenome) -> float:
+    time.sleep(0.02)
+    return _demo_fitness(genome)
+
+
+_demo_doomed_evaluations = 0
+
+
+def _demo_doomed_fitness(genome: DefaultGenome) -> float:
+    # the worker process dies in the middle of a batch after its first results, while it holds outstanding batches
+    global _demo_doomed_evaluations
+    _demo_doomed_evaluations += 1
+    if _demo_doomed_evaluations > 20:
+        os._exit(1)
+    return _demo_fitness(genome)
+
+
+class _DemoConfig(object):
+    # module level so it can be pickled to spawned workers
+    node_gene_type = NeuralNodeGene
+    connection_gene_type = NeuralConnectionGene
+    genome_type = DefaultGenome
+    input_keys = [-1, -2]
+    output_keys = [0]
+
+    weight_init_type = 'normal'
+    weight_mean = 0.0
+    weight_stdev = 1.0
+    weight_max_value = 2.0
+    weight_min_value = -2.0
+
+    response_init_type = 'normal'
+    response_mean = 0.0
+    response_stdev = 1.0
+    response_max_value = 2.0
+    response_min_value = -2.0
+
+    bias_init_type = 'normal'
+    bias_mean = 0.0
+    bias_stdev = 1.0
+    bias_max_value = 2.0
+    bias_min_value = -2.0
+
+    enabled_default_value = True
+
+    activation_function_def = {'sigmoid': activation_functions.SigmoidActivationFunction}
+    aggregation_function_def = {'sum': aggregation_functions.SumAggregationFunction}
+
+
+if __name__ == '__main__':
+    import multiprocessing
+    # workers are spawned, not forked: forking while the accept thread is running can deadlock the child
+    ctx = multiprocessing.get_context('spawn')
+    config = _DemoConfig()
+    population = {}
+    for i in range(2000):
+        g = DefaultGenome(i)
+        g.configure_new(config)
+        for _ in range(3):
+            g.mutate_add_connection(config)
+        population[i] = g
+
+    with Coordinator(config, pipeline_depth=2) as coordinator:
+        # three fast workers, one slow worker, one worker that dies in the middle of the run
+        processes = [ctx.Process(target=run_worker, args=(coordinator.address, config, _demo_fitness), daemon=True) for _ in range(3)]
+        processes.append(ctx.Process(target=run_worker, args=(coordinator.address, config, _demo_slow_fitness), daemon=True))
+        doomed = ctx.Process(target=run_worker, args=(coordinator.address, config, _demo_doomed_fitness), daemon=True)
+        for p in processes + [doomed]:
+            p.start()
+        start = time.perf_counter()
+        coordinator.evaluate(population, timeout=60.)
+        print('evaluated {0} genomes in {1:.2f}s, {2} batches retried'.format(len(population), time.perf_counter() - start, coordinator.retries))
+        print('batch sizes by worker:', [w.batch_size for w in coordinator.workers])
+        assert all(g.fitness is not None for g in population.values())
+        assert coordinator.retries > 0, 'the doomed worker did not die holding a batch'
+    for p in processes:
+        p.join()
@@ -2,11 +2,15 @@ import random
 from typing import Any, Tuple, List, Deque, Dict
 from abc import ABC, abstractmethod
 from collections import deque
-from attributes import FloatAttr, BoolAttr, StringAttr
+from attributes import FloatAttr, BoolAttr, CodedStringAttr
+from registry import get_functions
 import numpy as np
 
 
 class BaseGene(ABC):
+    # subclasses declare __slots__ from the names in _gene_attributes, genes have no instance __dict__
+    __slots__ = ('key',)
+
     @property
     @abstractmethod
     def _gene_attributes(self):
@@ -45,6 +49,8 @@ class BaseGene(ABC):
 
 
 class BaseNeuron(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def forward(self, config: object, inputs: List[float]) -> float:
         pass
@@ -58,9 +64,10 @@ class DefaultNodeGene(BaseGene):
     _gene_attributes = [
         FloatAttr('response'),
         FloatAttr('bias'),
-        StringAttr('activation', default_value='sigmoid'),
-        StringAttr('aggregation', default_value='sum')
+        CodedStringAttr('activation', 'activation_function_def', default_value='sigmoid'),
+        CodedStringAttr('aggregation', 'aggregation_function_def', default_value='sum')
     ]
+    __slots__ = tuple(a.name for a in _gene_attributes)
 
     def __init__(self, key: int):
         assert isinstance(key, int), '{0} key must be {1}'.format(self.__class__, int)
@@ -82,6 +89,7 @@ class DefaultConnectionGene(BaseGene):
         FloatAttr('weight'),
         BoolAttr('enabled')
     ]
+    __slots__ = tuple(a.name for a in _gene_attributes)
 
     def __init__(self, key: Tuple[int, int]):
         assert isinstance(key, tuple), '{0} key must be {1}'.format(self.__class__, tuple)
@@ -96,6 +104,7 @@ class DefaultConnectionGene(BaseGene):
 
 
 class NeuralNodeGene(DefaultNodeGene, BaseNeuron):
+    __slots__ = ()
     _grad_items_history_len: int = 4
     _grad_items_history: Deque = deque(maxlen=_grad_items_history_len)
 
@@ -112,10 +121,8 @@ class NeuralNodeGene(DefaultNodeGene, BaseNeuron):
             }
         }
         inputs = np.array(inputs, dtype=np.float32)
-        activation_function_def = getattr(config, 'activation_function_def')
-        aggregation_function_def = getattr(config, 'aggregation_function_def')
-        activation_f = activation_function_def[self.activation]
-        aggregation_f = aggregation_function_def[self.aggregation]
+        activation_f = get_functions(config, 'activation_function_def')[self.activation]
+        aggregation_f = get_functions(config, 'aggregation_function_def')[self.aggregation]
         self._grad_items_history.append(_grad_items)
         y = activation_f.calc(self.response * aggregation_f.calc(inputs) + self.bias)
         return float(y)
@@ -129,10 +136,8 @@ class NeuralNodeGene(DefaultNodeGene, BaseNeuron):
         inputs = _grad_items['inputs']
         assert inputs is not None and len(inputs) > 0
         _grad_items['gradient']['output'] = grad
-        activation_function_def = getattr(config, 'activation_function_def')
-        aggregation_function_def = getattr(config, 'aggregation_function_def')
-        activation_f = activation_function_def[self.activation]
-        aggregation_f = aggregation_function_def[self.aggregation]
+        activation_f = get_functions(config, 'activation_function_def')[self.activation]
+        aggregation_f = get_functions(config, 'aggregation_function_def')[self.aggregation]
         x = activation_f.derivative(self.response * aggregation_f.calc(inputs) + self.bias)
         bias_grad = float(x)
         response_grad = float(x * aggregation_f.calc(inputs))
@@ -144,6 +149,7 @@ class NeuralNodeGene(DefaultNodeGene, BaseNeuron):
 
 
 class NeuralConnectionGene(DefaultConnectionGene, BaseNeuron):
+    __slots__ = ()
     _grad_items_history_len: int = 4
     _grad_items_history: Deque = deque(maxlen=_grad_items_history_len)
 
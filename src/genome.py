@@ -11,6 +11,7 @@ class DefaultGenome(object):
         self.nodes: Dict[int, BaseGene] = {}
         self.connections: Dict[Tuple[int, int], BaseGene] = {}
         self.fitness: float = None
+        self.novelty: float = None
 
     def configure_new(self, config: object) -> None:
         for nk in getattr(config, 'output_keys'):
@@ -105,7 +106,7 @@ class DefaultGenome(object):
             return
         del_node_key = random.choice(available_node_keys)
         # delete connection that connected to 'will be deleted' node
-        for ck, cg in self.connections.items():
+        for ck in list(self.connections.keys()):
             if del_node_key in ck:
                 del self.connections[ck]
         del self.nodes[del_node_key]
@@ -131,6 +132,36 @@ class DefaultGenome(object):
             del_connection_key = random.choice(list(self.connections.keys()))
             del self.connections[del_connection_key]
 
+    def serialize(self, config: object) -> Dict[str, Any]:
+        # compact form: genes are flattened to [key..., attribute values...] in _gene_attributes order,
+        # coded attributes are written as names so the data does not depend on the order of the config defs
+        nodes = [[nk] + [a.serialize_value(getattr(ng, a.name), config) for a in ng._gene_attributes] for nk, ng in self.nodes.items()]
+        connections = [list(ck) + [a.serialize_value(getattr(cg, a.name), config) for a in cg._gene_attributes] for ck, cg in self.connections.items()]
+        return {
+            'key': self.key,
+            'fitness': self.fitness,
+            'nodes': nodes,
+            'connections': connections
+        }
+
+    @classmethod
+    def deserialize(cls, data: Dict[str, Any], config: object) -> Any:
+        genome = cls(data['key'])
+        genome.fitness = data['fitness']
+        node_gene_type = getattr(config, 'node_gene_type')
+        connection_gene_type = getattr(config, 'connection_gene_type')
+        for nk, *values in data['nodes']:
+            ng = node_gene_type(nk)
+            for a, v in zip(ng._gene_attributes, values):
+                setattr(ng, a.name, a.deserialize_value(v, config))
+            genome.nodes[nk] = ng
+        for inode_key, onode_key, *values in data['connections']:
+            cg = connection_gene_type((inode_key, onode_key))
+            for a, v in zip(cg._gene_attributes, values):
+                setattr(cg, a.name, a.deserialize_value(v, config))
+            genome.connections[cg.key] = cg
+        return genome
+
     @staticmethod
     def create_node(config: object, key: int) -> Any:
         new_node = getattr(config, 'node_gene_type')(key)
@@ -0,0 +1,188 @@
+from typing import Any, Dict, List, Iterator, Tuple, Deque
+from collections import deque
+from genome import DefaultGenome
+import numpy as np
+import json
+import os
+
+
+class RollingStats(object):
+    def __init__(self, window_size: int = 10):
+        assert window_size > 0, 'window_size must be greater than 0'
+        self.window_size = window_size
+        self.best_fitness: Deque[float] = deque(maxlen=window_size)
+        self.mean_fitness: Deque[float] = deque(maxlen=window_size)
+        self.num_species: Deque[int] = deque(maxlen=window_size)
+
+    def update(self, summary: Dict[str, Any]) -> None:
+        fitness = summary['fitness']
+        if fitness['count'] > 0:
+            self.best_fitness.append(fitness['max'])
+            self.mean_fitness.append(fitness['mean'])
+        self.num_species.append(len(summary['species_sizes']))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'best_fitness': float(np.mean(self.best_fitness)) if len(self.best_fitness) > 0 else None,
+            'mean_fitness': float(np.mean(self.mean_fitness)) if len(self.mean_fitness) > 0 else None,
+            'num_species': float(np.mean(self.num_species)) if len(self.num_species) > 0 else None,
+            # improvement of the best fitness from the oldest to the newest generation in the window
+            'best_fitness_delta': (self.best_fitness[-1] - self.best_fitness[0]) if len(self.best_fitness) > 0 else None
+        }
+
+
+class RunHistoryWriter(object):
+    # append-only, one JSON record per line, flushed after each generation so memory use stays flat
+    _quantiles = [0, 25, 50, 75, 100]
+
+    def __init__(self, path: str, config: object, window_size: int = 10):
+        self.path = path
+        self.config = config
+        self.rolling = RollingStats(window_size)
+        self.best_fitness: float = None
+        self._file = open(path, 'a')
+        # a killed run can leave a partial last line, a resumed run starts on a fresh line after it
+        if self._file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+
+    def write_generation(self, generation: int, genomes: Dict[Any, DefaultGenome], species: Dict[Any, List[Any]] = None) -> Dict[str, Any]:
+        fitnesses = np.array([g.fitness for g in genomes.values() if g.fitness is not None], dtype=np.float64)
+        fitness_summary = {'count': int(len(fitnesses))}
+        if len(fitnesses) > 0:
+            fitness_summary['min'] = float(fitnesses.min())
+            fitness_summary['max'] = float(fitnesses.max())
+            fitness_summary['mean'] = float(fitnesses.mean())
+            fitness_summary['stdev'] = float(fitnesses.std())
+            fitness_summary['quantiles'] = [float(q) for q in np.percentile(fitnesses, self._quantiles)]
+        summary = {
+            'type': 'generation',
+            'generation': generation,
+            'population_size': len(genomes),
+            'fitness': fitness_summary,
+            'species_sizes': {str(sk): len(members) for sk, members in (species or {}).items()}
+        }
+        self.rolling.update(summary)
+        self._write(summary)
+        champion = max((g for g in genomes.values() if g.fitness is not None), key=lambda g: g.fitness, default=None)
+        # champion genome is only written when the best fitness of the run improves
+        if (champion is not None) and ((self.best_fitness is None) or (champion.fitness > self.best_fitness)):
+            self.best_fitness = champion.fitness
+            self._write({
+                'type': 'champion',
+                'generation': generation,
+                'genome': champion.serialize(self.config)
+            })
+        self._file.flush()
+        return summary
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, separators=(',', ':')))
+        self._file.write('\n')
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_run_history(path: str, record_type: str = None) -> Iterator[Dict[str, Any]]:
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line of a run that is still being written, or was killed and then resumed
+            if (record_type is None) or (record.get('type') == record_type):
+                yield record
+
+
+def read_champions(path: str, config: object) -> Iterator[Tuple[int, DefaultGenome]]:
+    genome_type = getattr(config, 'genome_type', DefaultGenome)
+    for record in read_run_history(path, 'champion'):
+        yield record['generation'], genome_type.deserialize(record['genome'], config)
+
+
+def replay_rolling_stats(path: str, window_size: int = 10) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    rolling = RollingStats(window_size)
+    for record in read_run_history(path, 'generation'):
+        rolling.update(record)
+        yield record['generation'], rolling.stats()
+
+
+if __name__ == '__main__':
+    from genes import NeuralNodeGene, NeuralConnectionGene
+    from collections import namedtuple
+    from registry import get_function_registry
+    import activation_functions
+    import aggregation_functions
+    import random
+    import tempfile
+    y = {
+        'node_gene_type': NeuralNodeGene,
+        'connection_gene_type': NeuralConnectionGene,
+        'genome_type': DefaultGenome,
+        'input_keys': [-1, -2],
+        'output_keys': [0],
+        'add_node_mutation_prob': 0.5,
+        'del_node_mutation_prob': 0.0,
+        'add_connection_mutation_prob': 0.9,
+        'del_connection_mutation_prob': 0.0,
+        'weight_init_type': 'normal', 'weight_mean': 0.0, 'weight_stdev': 1.0, 'weight_max_value': 2.0, 'weight_min_value': -2.0,
+        'weight_mutation_power': 1.0, 'weight_mutation_rate': 0.6, 'weight_replace_rate': 0.2,
+        'response_init_type': 'normal', 'response_mean': 0.0, 'response_stdev': 1.0, 'response_max_value': 2.0, 'response_min_value': -2.0,
+        'response_mutation_power': 1.0, 'response_mutation_rate': 0.6, 'response_replace_rate': 0.2,
+        'bias_init_type': 'normal', 'bias_mean': 0.0, 'bias_stdev': 1.0, 'bias_max_value': 2.0, 'bias_min_value': -2.0,
+        'bias_mutation_power': 1.0, 'bias_mutation_rate': 0.6, 'bias_replace_rate': 0.2,
+        'activation_mutation_rate': 0.0, 'activation_value_mutation_rate': {'sigmoid': 0.5, 'tanh': 0.5},
+        'aggregation_mutation_rate': 0.0, 'aggregation_value_mutation_rate': {'sum': 0.5, 'mean': 0.5},
+        'enabled_mutation_rate': 0.0,
+        'activation_function_def': {
+            'sigmoid': activation_functions.SigmoidActivationFunction,
+            'tanh': activation_functions.TanhActivationFunction
+        },
+        'aggregation_function_def': {
+            'sum': aggregation_functions.SumAggregationFunction,
+            'mean': aggregation_functions.MeanAggregationFunction
+        }
+    }
+    yp = namedtuple('config', y.keys())(*y.values())
+    path = os.path.join(tempfile.mkdtemp(), 'run.jsonl')
+    with RunHistoryWriter(path, yp, window_size=3) as writer:
+        for generation in range(5):
+            population = {}
+            for i in range(10):
+                g = DefaultGenome(i)
+                g.configure_new(yp)
+                g.mutate(yp)
+                g.fitness = random.random() * (generation + 1)
+                population[i] = g
+            writer.write_generation(generation, population, {0: list(range(6)), 1: list(range(6, 10))})
+            print(writer.rolling.stats())
+    for generation, stats in replay_rolling_stats(path, window_size=3):
+        print(generation, stats)
+    for generation, champion in read_champions(path, yp):
+        print(generation, champion.fitness, champion.nodes.keys(), champion.connections.keys())
+    # champions are stored with function names, so they replay correctly with a differently ordered def
+    reordered = dict(y, activation_function_def=dict(reversed(list(y['activation_function_def'].items()))))
+    reordered_config = namedtuple('config', reordered.keys())(*reordered.values())
+    _, champion = list(read_champions(path, yp))[-1]
+    _, replayed = list(read_champions(path, reordered_config))[-1]
+    assert [get_function_registry(yp, 'activation_function_def').name(ng.activation) for ng in champion.nodes.values()] == \
+        [get_function_registry(reordered_config, 'activation_function_def').name(ng.activation) for ng in replayed.nodes.values()]
+    # a run killed in the middle of a record and resumed into the same file keeps every generation
+    with open(path, 'a') as f:
+        f.write('{"type": "generation", "generation": 5, "popul')
+    with RunHistoryWriter(path, yp, window_size=3) as writer:
+        writer.write_generation(5, population)
+    assert [g for g, _ in replay_rolling_stats(path)] == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,123 @@
+# standalone runtime for exported networks, depends on numpy and the standard library only
+# file layout (little-endian):
+#   magic (8 bytes) | version (uint32) | header length (uint32) | JSON header | padding | arrays
+# the JSON header holds the network sizes, the activation/aggregation name tables and, for every array, its dtype,
+# shape and byte offset from the start of the file; arrays are aligned to ARRAY_ALIGNMENT bytes so they can be used
+# in place from a memory map
+# a network is evaluated in float64 by default; dtype='float32' is the fast-math mode: the matrix products and the
+# numpy exp/tanh loops run on float32, for a max error of about 1e-7 per activation against activation_functions.py;
+# it only pays off for batches of inputs, a single input costs the same per-layer call overhead in both modes
+# (see the inference_export demo for both numbers)
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import struct
+import mmap
+import json
+
+MAGIC = b'NEATNET\x00'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ARRAY_ALIGNMENT = 64
+
+ACTIVATION_FUNCTIONS = {
+    'sigmoid': lambda x: 0.5 * (1. + np.tanh(0.5 * x)),  # 1 / (1 + exp(-x)) without overflow
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0.),
+    'gauss': lambda x: np.exp(-x ** 2)
+}
+AGGREGATION_FUNCTIONS = ['sum', 'mean', 'product']
+
+
+class InferenceNetwork(object):
+    # feed-forward network evaluated layer by layer on a batch of inputs:
+    # value slots [0, num_inputs) hold the inputs, node i of the file is slot num_inputs + i
+    def __init__(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray], buffer: Any = None, dtype: str = 'float64'):
+        self.num_inputs: int = header['num_inputs']
+        self.num_outputs: int = header['num_outputs']
+        self.activation_names: List[str] = header['activation_names']
+        self.aggregation_names: List[str] = header['aggregation_names']
+        self.arrays = arrays
+        self._buffer = buffer
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise RuntimeError('{0}: dtype {1} not supported, expected float32 or float64'.format(self.__class__, dtype))
+        # only the functions some node uses have to be supported
+        for code in np.unique(arrays['node_activation']):
+            if self.activation_names[code] not in ACTIVATION_FUNCTIONS:
+                raise RuntimeError('{0}: activation {1} not supported'.format(self.__class__, self.activation_names[code]))
+        for code in np.unique(arrays['node_aggregation']):
+            if self.aggregation_names[code] not in AGGREGATION_FUNCTIONS:
+                raise RuntimeError('{0}: aggregation {1} not supported'.format(self.__class__, self.aggregation_names[code]))
+        self.num_slots = self.num_inputs + len(arrays['node_bias'])
+        self._layers = [self._prepare_layer(li) for li in range(len(arrays['layer_node_offsets']) - 1)]
+
+    def _prepare_layer(self, li: int) -> Tuple:
+        a = self.arrays
+        n0, n1 = int(a['layer_node_offsets'][li]), int(a['layer_node_offsets'][li + 1])
+        c0, c1 = int(a['layer_connection_offsets'][li]), int(a['layer_connection_offsets'][li + 1])
+        src, dst, weight = a['connection_src'][c0:c1], a['connection_dst'][c0:c1] - (self.num_inputs + n0), a['connection_weight'][c0:c1]
+        aggregation = np.asarray(a['node_aggregation'][n0:n1])
+        # sum and mean nodes: one dense matrix product over every slot computed so far
+        matrix = np.zeros((self.num_inputs + n0, n1 - n0), dtype=np.float64)
+        np.add.at(matrix, (src, dst), weight)
+        in_degree = np.bincount(dst, minlength=n1 - n0).astype(np.float64)
+        scale = np.ones(n1 - n0, dtype=np.float64)
+        mean = aggregation == self.aggregation_names.index('mean') if 'mean' in self.aggregation_names else np.zeros(n1 - n0, dtype=bool)
+        scale[mean] = 1. / np.maximum(in_degree[mean], 1.)
+        # product nodes: per connection
+        product_nodes = np.flatnonzero(aggregation == self.aggregation_names.index('product')) if 'product' in self.aggregation_names else np.zeros(0, dtype=np.int64)
+        product_connections = np.flatnonzero(np.isin(dst, product_nodes))
+        activation = np.asarray(a['node_activation'][n0:n1])
+        activation_groups = [(ACTIVATION_FUNCTIONS[self.activation_names[code]], np.flatnonzero(activation == code)) for code in np.unique(activation)]
+        return (self.num_inputs + n0, self.num_inputs + n1, (matrix * scale).astype(self.dtype, copy=False), product_nodes,
+                src[product_connections], dst[product_connections], weight[product_connections].astype(self.dtype, copy=False),
+                a['node_response'][n0:n1].astype(self.dtype, copy=False), a['node_bias'][n0:n1].astype(self.dtype, copy=False), activation_groups)
+
+    def activate(self, inputs: Any) -> np.ndarray:
+        # inputs of shape (num_inputs,) or (batch, num_inputs), returns (num_outputs,) or (batch, num_outputs)
+        x = np.asarray(inputs, dtype=self.dtype)
+        single = x.ndim == 1
+        x = x.reshape(-1, self.num_inputs)
+        values = np.zeros((len(x), self.num_slots), dtype=self.dtype)
+        values[:, :self.num_inputs] = x
+        for start, end, matrix, product_nodes, p_src, p_dst, p_weight, response, bias, activation_groups in self._layers:
+            aggregated = values[:, :start] @ matrix
+            if len(product_nodes) > 0:
+                product = np.ones((len(x), end - start), dtype=self.dtype)
+                for s, d, w in zip(p_src, p_dst, p_weight):
+                    product[:, d] *= values[:, s] * w
+                aggregated[:, product_nodes] = product[:, product_nodes]
+            z = response * aggregated + bias
+            for f, columns in activation_groups:
+                values[:, start + columns] = f(z[:, columns])
+        outputs = values[:, np.asarray(self.arrays['output_slots'])]
+        return outputs[0] if single else outputs
+
+    def close(self) -> None:
+        # views into the memory map have to be released before it can be closed
+        self.arrays = {}
+        self._layers = []
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+
+def parse_header(buffer: Any) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise RuntimeError('not an exported network file')
+    if version != VERSION:
+        raise RuntimeError('exported network version {0} not supported, expected {1}'.format(version, VERSION))
+    header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]).decode())
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=offset).reshape(shape)
+    return header, arrays
+
+
+def load_network(path: str, dtype: str = 'float64') -> InferenceNetwork:
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header, arrays = parse_header(buffer)
+    return InferenceNetwork(header, arrays, buffer, dtype)
@@ -0,0 +1,244 @@
+from typing import Any, Dict, List
+from genome import DefaultGenome
+from registry import get_function_registry
+from utils import required_for_output
+from inference import MAGIC, VERSION, PREAMBLE, ARRAY_ALIGNMENT
+import activation_functions
+import aggregation_functions
+import numpy as np
+import json
+
+
+# the function classes the standalone runtime (inference.ACTIVATION_FUNCTIONS / AGGREGATION_FUNCTIONS) implements
+_runtime_activations = {
+    'sigmoid': activation_functions.SigmoidActivationFunction,
+    'tanh': activation_functions.TanhActivationFunction,
+    'relu': activation_functions.ReluActivationFunction,
+    'gauss': activation_functions.GaussianActivationFunction
+}
+_runtime_aggregations = {
+    'sum': aggregation_functions.SumAggregationFunction,
+    'mean': aggregation_functions.MeanAggregationFunction,
+    'product': aggregation_functions.ProductAggregationFunction
+}
+
+
+def _used_functions(registry: Any, codes: List[int], runtime_functions: Dict[str, Any], kind: str) -> Dict[int, int]:
+    # config code -> code in the exported name table, which only lists the functions the network uses
+    used = sorted(set(codes))
+    for code in used:
+        name, f = registry.name(code), registry.functions[code]
+        if runtime_functions.get(name) is not f:
+            raise RuntimeError('{0} "{1}" ({2}) is not implemented by the inference runtime, supported: {3}'.format(
+                kind, name, f, {n: rf.__name__ for n, rf in runtime_functions.items()}))
+    return {code: i for i, code in enumerate(used)}
+
+
+def feed_forward_layers(input_keys: List[int], node_keys: List[int], connections: List[Any]) -> List[List[int]]:
+    # layer of a node = 1 + deepest layer among its sources, inputs are layer 0
+    sources: Dict[int, List[int]] = {nk: [] for nk in node_keys}
+    for i, o in connections:
+        sources[o].append(i)
+    depth = {ik: 0 for ik in input_keys}
+    remaining = set(node_keys)
+    while len(remaining) > 0:
+        ready = [nk for nk in remaining if all(s in depth for s in sources[nk])]
+        if len(ready) == 0:
+            raise RuntimeError('genome is recurrent, only feed-forward networks can be exported: nodes {0}'.format(sorted(remaining)))
+        for nk in ready:
+            depth[nk] = 1 + max((depth[s] for s in sources[nk]), default=0)
+            remaining.remove(nk)
+    num_layers = max((depth[nk] for nk in node_keys), default=0)
+    return [sorted(nk for nk in node_keys if depth[nk] == li) for li in range(1, num_layers + 1)]
+
+
+def export_network(genome: DefaultGenome, config: object, path: str) -> None:
+    input_keys = list(getattr(config, 'input_keys'))
+    output_keys = list(getattr(config, 'output_keys'))
+    activation_registry = get_function_registry(config, 'activation_function_def')
+    aggregation_registry = get_function_registry(config, 'aggregation_function_def')
+    # prune: keep enabled connections and the nodes required for the outputs
+    enabled = [ck for ck, cg in genome.connections.items() if cg.enabled]
+    required = set(required_for_output(input_keys, output_keys, enabled)) | set(output_keys)
+    connections = [(i, o) for (i, o) in enabled if (o in required) and ((i in required) or (i in input_keys))]
+    layers = feed_forward_layers(input_keys, sorted(required), connections)
+    node_order = [nk for layer in layers for nk in layer]
+    slot = {ik: i for i, ik in enumerate(input_keys)}
+    slot.update({nk: len(input_keys) + i for i, nk in enumerate(node_order)})
+    layer_of = {nk: li for li, layer in enumerate(layers) for nk in layer}
+    connections.sort(key=lambda ck: (layer_of[ck[1]], slot[ck[1]], slot[ck[0]]))
+    nodes = [genome.nodes[nk] for nk in node_order]
+    activation_codes = _used_functions(activation_registry, [ng.activation for ng in nodes], _runtime_activations, 'activation')
+    aggregation_codes = _used_functions(aggregation_registry, [ng.aggregation for ng in nodes], _runtime_aggregations, 'aggregation')
+    arrays = {
+        'node_bias': np.array([ng.bias for ng in nodes], dtype='<f8'),
+        'node_response': np.array([ng.response for ng in nodes], dtype='<f8'),
+        'node_activation': np.array([activation_codes[ng.activation] for ng in nodes], dtype='<i4'),
+        'node_aggregation': np.array([aggregation_codes[ng.aggregation] for ng in nodes], dtype='<i4'),
+        'connection_src': np.array([slot[i] for i, _ in connections], dtype='<i4'),
+        'connection_dst': np.array([slot[o] for _, o in connections], dtype='<i4'),
+        'connection_weight': np.array([genome.connections[ck].weight for ck in connections], dtype='<f8'),
+        'layer_node_offsets': np.cumsum([0] + [len(layer) for layer in layers]).astype('<i8'),
+        'layer_connection_offsets': np.cumsum([0] + [sum(1 for ck in connections if layer_of[ck[1]] == li) for li in range(len(layers))]).astype('<i8'),
+        'output_slots': np.array([slot[ok] for ok in output_keys], dtype='<i4')
+    }
+    header = {
+        'num_inputs': len(input_keys),
+        'num_outputs': len(output_keys),
+        'genome_key': genome.key if isinstance(genome.key, (int, str)) else str(genome.key),
+        'fitness': genome.fitness,
+        'activation_names': [activation_registry.name(code) for code in activation_codes],
+        'aggregation_names': [aggregation_registry.name(code) for code in aggregation_codes],
+        'arrays': {}
+    }
+    # offsets depend on the header length, which depends on the offsets: grow the reserved header size until it fits
+    reserved = 256
+    while True:
+        offset = _align(PREAMBLE.size + reserved)
+        for name, a in arrays.items():
+            header['arrays'][name] = [a.dtype.str, list(a.shape), offset]
+            offset = _align(offset + a.nbytes)
+        header_bytes = json.dumps(header, separators=(',', ':')).encode()
+        if len(header_bytes) <= reserved:
+            break
+        reserved = 2 * len(header_bytes)
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, a in arrays.items():
+            f.write(b'\x00' * (header['arrays'][name][2] - f.tell()))
+            f.write(a.tobytes())
+
+
+def _align(offset: int) -> int:
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+if __name__ == '__main__':
+    from genes import NeuralNodeGene, NeuralConnectionGene
+    from collections import namedtuple
+    import activation_functions
+    import aggregation_functions
+    import subprocess
+    import tempfile
+    import sys
+    import os
+    y = {
+        'node_gene_type': NeuralNodeGene,
+        'connection_gene_type': NeuralConnectionGene,
+        'input_keys': [-1, -2],
+        'output_keys': [0],
+        'weight_init_type': 'normal', 'weight_mean': 0.0, 'weight_stdev': 1.0, 'weight_max_value': 2.0, 'weight_min_value': -2.0,
+        'response_init_type': 'normal', 'response_mean': 1.0, 'response_stdev': 0.5, 'response_max_value': 2.0, 'response_min_value': -2.0,
+        'bias_init_type': 'normal', 'bias_mean': 0.0, 'bias_stdev': 1.0, 'bias_max_value': 2.0, 'bias_min_value': -2.0,
+        'activation_init_type': 'random', 'activation_value_mutation_rate': {'sigmoid': 0.25, 'tanh': 0.25, 'relu': 0.25, 'gauss': 0.25},
+        'aggregation_init_type': 'random', 'aggregation_value_mutation_rate': {'sum': 0.4, 'mean': 0.3, 'product': 0.3},
+        'enabled_default_value': True,
+        'activation_function_def': {
+            'sigmoid': activation_functions.SigmoidActivationFunction,
+            'tanh': activation_functions.TanhActivationFunction,
+            'relu': activation_functions.ReluActivationFunction,
+            'gauss': activation_functions.GaussianActivationFunction
+        },
+        'aggregation_function_def': {
+            'sum': aggregation_functions.SumAggregationFunction,
+            'mean': aggregation_functions.MeanAggregationFunction,
+            'product': aggregation_functions.ProductAggregationFunction
+        }
+    }
+    yp = namedtuple('config', y.keys())(*y.values())
+    g = DefaultGenome('champion')
+    for nk in [0, 1, 2, 3]:
+        g.nodes[nk] = g.create_node(yp, nk)  # node 3 is not connected to the output and gets pruned
+    for ck in [(-1, 1), (-2, 1), (-1, 2), (1, 2), (1, 0), (2, 0), (-2, 0), (-1, 3), (3, 3)]:
+        g.connections[ck] = g.create_connection(yp, *ck)
+    g.connections[(-2, 0)].enabled = False
+
+    def reference(x: List[float]) -> float:
+        values = {-1: x[0], -2: x[1]}
+        for nk in [1, 2, 0]:
+            inputs = [g.connections[ck].forward(yp, [values[ck[0]]]) for ck in g.connections if ck[1] == nk and g.connections[ck].enabled]
+            values[nk] = g.nodes[nk].forward(yp, inputs)
+        return values[0]
+
+    path = os.path.join(tempfile.mkdtemp(), 'champion.neat')
+    export_network(g, yp, path)
+    print('exported {0} bytes'.format(os.path.getsize(path)))
+    from inference import load_network
+    net = load_network(path)
+    xs = np.random.uniform(-2., 2., (100, 2))
+    error = max(abs(float(net.activate(x)[0]) - reference(list(x))) for x in xs)
+    print('max difference to the genome forward pass: {0:.2e}'.format(error))  # genome forward pass uses float32 inputs
+    print('batch output shape', net.activate(xs).shape)
+    net.close()
+    # cold start in a fresh interpreter: import, mmap and first activation
+    script = ('import time; t = time.perf_counter(); import sys; sys.path.insert(0, {0!r}); from inference import load_network; '
+              'net = load_network({1!r}); net.activate([0.5, -0.5]); '
+              'print("cold start {{0:.1f}}ms".format((time.perf_counter() - t) * 1e3), "genome modules imported:", '
+              'any(m in sys.modules for m in ["genome", "genes", "attributes"]))').format(os.path.dirname(os.path.abspath(__file__)), path)
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+    # only the functions the network uses are written, an unused function the runtime lacks does not matter
+    class IdentityActivationFunction(activation_functions.BaseActivationFunction):
+        @staticmethod
+        def calc(x: float) -> float:
+            return x
+
+        @staticmethod
+        def derivative(x: float) -> float:
+            return 1.
+
+    extended = yp._replace(activation_function_def=dict(yp.activation_function_def, identity=IdentityActivationFunction))
+    export_network(g, extended, path)
+    net = load_network(path)
+    print('exported activation names:', net.activation_names)
+    net.close()
+    # a custom class under a built-in name is rejected at export instead of running the built-in function
+    custom = yp._replace(activation_function_def={name: IdentityActivationFunction for name in yp.activation_function_def})
+    try:
+        export_network(g, custom, path)
+        raise AssertionError('custom activation was exported')
+    except RuntimeError as e:
+        print('rejected:', e)
+
+    # fast-math mode: float32 activations against the exact math.exp based classes of activation_functions.py,
+    # absolute error below 1, relative above
+    grid = np.linspace(-20., 20., 20001)
+    from inference import ACTIVATION_FUNCTIONS
+    for name, f in _runtime_activations.items():
+        exact = np.array([f.calc(float(x)) for x in grid])
+        error = np.abs(ACTIVATION_FUNCTIONS[name](grid.astype(np.float32)) - exact) / np.maximum(np.abs(exact), 1.)
+        print('float32 {0:8s} max error {1:.1e}'.format(name, float(error.max())))
+    # forward pass of a wider network of sum nodes: genome forward with the exact classes vs the runtime in float64 and float32
+    import timeit
+    wide = DefaultGenome('wide')
+    hidden = list(range(1, 129))
+    for nk in [0] + hidden:
+        wide.nodes[nk] = wide.create_node(yp, nk)
+        wide.nodes[nk].aggregation = get_function_registry(yp, 'aggregation_function_def').code('sum')
+    for nk in hidden:
+        for ck in [(-1, nk), (-2, nk), (nk, 0)]:
+            wide.connections[ck] = wide.create_connection(yp, *ck)
+            wide.connections[ck].enabled = True
+    incoming = {nk: [ck for ck in wide.connections if ck[1] == nk] for nk in wide.nodes}
+
+    def wide_reference(x: List[float]) -> float:
+        values = {-1: x[0], -2: x[1]}
+        for nk in hidden + [0]:
+            values[nk] = wide.nodes[nk].forward(yp, [wide.connections[ck].forward(yp, [values[ck[0]]]) for ck in incoming[nk]])
+        return values[0]
+
+    export_network(wide, yp, path)
+    xs = np.random.uniform(-2., 2., (10000, 2))
+    # the genome forward pass rounds node inputs to float32, which bounds the agreement of both modes
+    reference_outputs = np.array([wide_reference(list(x)) for x in xs[:100]])
+    reference_time = timeit.timeit(lambda: wide_reference(list(xs[0])), number=10) / 10
+    print('genome forward, exact functions: {0:.1f}us per input'.format(reference_time * 1e6))
+    for dtype in ['float64', 'float32']:
+        net = load_network(path, dtype=dtype)
+        error = float(np.abs(net.activate(xs[:100])[:, 0] - reference_outputs).max())
+        single_time = timeit.timeit(lambda: net.activate(xs[0]), number=1000) / 1000
+        batch_time = timeit.timeit(lambda: net.activate(xs), number=20) / 20 / len(xs)
+        print('runtime {0}: {1:.1f}us single input, {2:.3f}us per input in batches of {3} ({4:.0f}x), max error {5:.1e}'.format(
+            dtype, single_time * 1e6, batch_time * 1e6, len(xs), reference_time / batch_time, error))
+        net.close()
@@ -0,0 +1,220 @@
+from typing import Any, Dict, Tuple, List
+from genome import DefaultGenome
+import numpy as np
+
+
+def _squared_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # pairwise squared euclidean distances, shape (len(a), len(b)), without the (len(a), len(b), dim) temporary
+    d = (a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2. * (a @ b.T)
+    return np.maximum(d, 0.)
+
+
+class KDTree(object):
+    # kd-tree with bucketed leaves: points are stored leaf by leaf in one contiguous array
+    _gather_max_leaves = 32  # above this many candidate leaves a mask over all points is cheaper than concatenating ranges
+    def __init__(self, points: np.ndarray, leaf_size: int = 64):
+        assert leaf_size > 0, 'leaf_size must be greater than 0'
+        n = len(points)
+        index = np.arange(n)
+        leaves: List[Tuple[int, int]] = []
+        stack = [(0, n)] if n > 0 else []
+        while len(stack) > 0:
+            start, end = stack.pop()
+            if end - start <= leaf_size:
+                leaves.append((start, end))
+                continue
+            segment = points[index[start:end]]
+            dim = int(np.argmax(segment.max(axis=0) - segment.min(axis=0)))  # split along the widest dimension
+            mid = (end - start) // 2
+            index[start:end] = index[start:end][np.argpartition(segment[:, dim], mid)]
+            stack.append((start + mid, end))
+            stack.append((start, start + mid))
+        self.index = index  # position in tree order -> position in the original points
+        self.points = points[index]
+        self.leaf_start = np.array([s for s, _ in leaves], dtype=np.int64)
+        self.leaf_end = np.array([e for _, e in leaves], dtype=np.int64)
+        d = points.shape[1]
+        self.leaf_lo = np.array([self.points[s:e].min(axis=0) for s, e in leaves]).reshape(-1, d)
+        self.leaf_hi = np.array([self.points[s:e].max(axis=0) for s, e in leaves]).reshape(-1, d)
+        self.leaf_of = np.repeat(np.arange(len(leaves)), self.leaf_end - self.leaf_start)  # position -> leaf
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def candidates(self, query: np.ndarray, k: int, box_distance: np.ndarray) -> np.ndarray:
+        # positions (in tree order) of every point that can be among the k nearest neighbours of query
+        # box_distance and the bound are squared distances
+        # the k-th distance among the points of the nearest leaves bounds the k-th neighbour distance, widen the set
+        # of nearest leaves until it holds at least k points
+        num_nearest = min(4, len(box_distance))
+        while True:
+            nearest_leaves = np.argpartition(box_distance, num_nearest - 1)[:num_nearest]
+            nearest = self._gather(nearest_leaves)
+            if (len(nearest) >= k) or (num_nearest == len(box_distance)):
+                break
+            num_nearest = min(2 * num_nearest, len(box_distance))
+        if len(nearest) < k:
+            return np.arange(len(self.points))  # fewer than k points in the tree, the rest comes from the tail
+        d = ((self.points[nearest] - query) ** 2).sum(axis=1)
+        bound = np.partition(d, k - 1)[k - 1]
+        leaves = np.flatnonzero(box_distance <= bound)
+        if len(leaves) > self._gather_max_leaves:
+            return np.flatnonzero((box_distance <= bound)[self.leaf_of])
+        return self._gather(leaves)
+
+    def _gather(self, leaves: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.arange(self.leaf_start[li], self.leaf_end[li]) for li in leaves])
+
+    def box_distance(self, queries: np.ndarray) -> np.ndarray:
+        # squared distance from every query to every leaf bounding box, shape (num_queries, num_leaves)
+        q = queries[:, None, :]
+        diff = np.maximum(np.maximum(self.leaf_lo[None, :, :] - q, q - self.leaf_hi[None, :, :]), 0.)
+        return (diff ** 2).sum(axis=2)
+
+
+class NoveltyArchive(object):
+    # behaviour descriptors live in a growable contiguous array, the first _indexed of them are covered by a kd-tree
+    # and the newer tail is searched by brute force; the tree is rebuilt once the tail grows past rebuild_fraction
+    # of the indexed part, so the total rebuild cost stays O(n log n) amortized
+    _eviction_policies = ['fifo', 'random']
+    _query_chunk_size = 256
+
+    def __init__(self, dim: int, k: int = 15, max_size: int = None, eviction: str = 'fifo', eviction_fraction: float = 0.1,
+                 add_threshold: float = None, add_probability: float = 0.0, leaf_size: int = 64,
+                 rebuild_fraction: float = 0.25, initial_capacity: int = 1024):
+        assert k > 0, 'k must be greater than 0'
+        assert (max_size is None) or (max_size > 0), 'max_size must be greater than 0'
+        assert 0. <= eviction_fraction < 1., 'eviction_fraction must be in [0, 1)'
+        if eviction not in self._eviction_policies:
+            raise RuntimeError('{0}: eviction {1} not recognized'.format(self.__class__, eviction))
+        self.dim = dim
+        self.k = k
+        self.max_size = max_size
+        self.eviction = eviction
+        self.eviction_fraction = eviction_fraction
+        self.add_threshold = add_threshold
+        self.add_probability = add_probability
+        self.leaf_size = max(leaf_size, k)
+        self.rebuild_fraction = rebuild_fraction
+        self._data = np.empty((max(initial_capacity, 1), dim), dtype=np.float64)
+        self._size = 0
+        self._indexed = 0
+        self._tree: KDTree = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def descriptors(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def add(self, descriptors: np.ndarray) -> None:
+        descriptors = np.asarray(descriptors, dtype=np.float64).reshape(-1, self.dim)
+        n = len(descriptors)
+        if self._size + n > len(self._data):
+            capacity = len(self._data)
+            while capacity < self._size + n:
+                capacity *= 2
+            data = np.empty((capacity, self.dim), dtype=np.float64)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:self._size + n] = descriptors
+        self._size += n
+        if (self.max_size is not None) and (self._size > self.max_size):
+            self._evict()
+        if self._size - self._indexed > max(self.leaf_size, self.rebuild_fraction * self._indexed):
+            self._rebuild()
+
+    def _evict(self) -> None:
+        # evict a little more than needed so an archive at its cap is not rebuilt on every add
+        keep = max(1, min(int(self.max_size * (1. - self.eviction_fraction)), self.max_size))
+        if self.eviction == 'fifo':
+            kept = self._data[self._size - keep:self._size]
+        else:
+            kept = self._data[np.sort(np.random.choice(self._size, keep, replace=False))]
+        self._data[:keep] = kept
+        self._size = keep
+        self._indexed = 0
+        self._tree = None
+
+    def _rebuild(self) -> None:
+        self._tree = KDTree(self._data[:self._size], self.leaf_size)
+        self._indexed = self._size
+
+    def knn(self, queries: np.ndarray, k: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        # distances and archive positions of the k nearest descriptors for each query, nearest first
+        k = min(self.k if k is None else k, self._size)
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.dim)
+        distances = np.zeros((len(queries), k), dtype=np.float64)
+        indices = np.zeros((len(queries), k), dtype=np.int64)
+        if k == 0:
+            return distances, indices
+        tail = self._data[self._indexed:self._size]
+        for chunk_start in range(0, len(queries), self._query_chunk_size):
+            chunk = queries[chunk_start:chunk_start + self._query_chunk_size]
+            box_distance = self._tree.box_distance(chunk) if self._tree is not None else None
+            tail_distance = _squared_distance(chunk, tail)
+            for i, q in enumerate(chunk):
+                if self._tree is not None:
+                    positions = self._tree.candidates(q, k, box_distance[i])
+                    d = np.concatenate([((self._tree.points[positions] - q) ** 2).sum(axis=1), tail_distance[i]])
+                    idx = np.concatenate([self._tree.index[positions], np.arange(self._indexed, self._size)])
+                else:
+                    d = tail_distance[i]
+                    idx = np.arange(self._size)
+                nearest = np.argpartition(d, k - 1)[:k]
+                nearest = nearest[np.argsort(d[nearest])]
+                distances[chunk_start + i] = np.sqrt(d[nearest])
+                indices[chunk_start + i] = idx[nearest]
+        return distances, indices
+
+    def novelty(self, descriptors: np.ndarray) -> np.ndarray:
+        # mean distance to the k nearest neighbours among the archive and the other members of the batch
+        descriptors = np.asarray(descriptors, dtype=np.float64).reshape(-1, self.dim)
+        n = len(descriptors)
+        archive_distance, _ = self.knn(descriptors)
+        batch_distance = np.sqrt(_squared_distance(descriptors, descriptors))
+        np.fill_diagonal(batch_distance, np.inf)
+        d = np.concatenate([archive_distance, batch_distance], axis=1)
+        k = min(self.k, self._size + n - 1)
+        if k <= 0:
+            return np.zeros(n, dtype=np.float64)
+        return np.partition(d, k - 1, axis=1)[:, :k].mean(axis=1)
+
+    def evaluate(self, genomes: Dict[Any, DefaultGenome], descriptors: Dict[Any, Any]) -> Dict[Any, float]:
+        keys = list(genomes.keys())
+        batch = np.array([descriptors[gk] for gk in keys], dtype=np.float64).reshape(-1, self.dim)
+        novelty = self.novelty(batch)
+        for gk, nv in zip(keys, novelty):
+            genomes[gk].novelty = float(nv)
+        added = np.random.random(len(keys)) < self.add_probability
+        if self.add_threshold is not None:
+            added |= novelty > self.add_threshold
+        self.add(batch[added])
+        return {gk: genomes[gk].novelty for gk in keys}
+
+
+if __name__ == '__main__':
+    import time
+    dim = 4
+    archive = NoveltyArchive(dim, k=15, max_size=150000)
+    start = time.perf_counter()
+    for _ in range(100):
+        archive.add(np.random.random((1000, dim)))
+    print('added {0} descriptors in {1:.3f}s, archive size {2}'.format(100 * 1000, time.perf_counter() - start, len(archive)))
+    population = np.random.random((150, dim))
+    start = time.perf_counter()
+    distances, indices = archive.knn(population)
+    print('knn for {0} queries: {1:.3f}s'.format(len(population), time.perf_counter() - start))
+    brute = np.sqrt(_squared_distance(population, archive.descriptors))
+    assert np.allclose(np.sort(brute, axis=1)[:, :archive.k], distances)
+    start = time.perf_counter()
+    novelty = archive.novelty(population)
+    print('novelty for {0} descriptors: {1:.3f}s, mean {2:.4f}'.format(len(population), time.perf_counter() - start, novelty.mean()))
+    genomes = {i: DefaultGenome(i) for i in range(150)}
+    archive.add_threshold = float(np.median(novelty))
+    archive.evaluate(genomes, {i: population[i] for i in range(150)})
+    print('archive size after evaluate {0}'.format(len(archive)))
+    for _ in range(60):
+        archive.add(np.random.random((1000, dim)))
+    print('archive size after eviction {0}'.format(len(archive)))
@@ -0,0 +1,55 @@
+from typing import Any, Dict, List
+
+
+class FunctionRegistry(object):
+    # interns the names of a function def (e.g. config.activation_function_def) as small integer codes,
+    # codes follow the insertion order of the def, so the same config gives the same codes in every process
+    def __init__(self, function_def: Dict[str, Any]):
+        self.function_def = function_def
+        self.names: List[str] = list(function_def.keys())
+        self.functions: List[Any] = list(function_def.values())
+        self.codes: Dict[str, int] = {name: code for code, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            raise RuntimeError('{0}: "{1}" not exist in function def {2}'.format(self.__class__, name, self.names))
+        return code
+
+    def name(self, code: int) -> str:
+        return self.names[code]
+
+    def matches(self, function_def: Dict[str, Any]) -> bool:
+        return (self.names == list(function_def.keys())) and (self.functions == list(function_def.values()))
+
+
+# function def id -> registry; a registry keeps its def alive, so a cached id cannot be reused by another dict,
+# and the cache is bounded, so defs that are no longer used are dropped
+_registries: Dict[int, FunctionRegistry] = {}
+_max_registries = 64
+
+
+def get_function_registry(config: object, function_def_name: str) -> FunctionRegistry:
+    # checks the whole def, so a def changed in place gets a new registry
+    function_def = getattr(config, function_def_name)
+    registry = _registries.get(id(function_def))
+    if (registry is None) or (registry.function_def is not function_def) or (not registry.matches(function_def)):
+        registry = FunctionRegistry(function_def)
+        _registries.pop(id(function_def), None)
+        if len(_registries) >= _max_registries:
+            del _registries[next(iter(_registries))]
+        _registries[id(function_def)] = registry
+    return registry
+
+
+def get_functions(config: object, function_def_name: str) -> List[Any]:
+    # hot path (NeuralNodeGene.forward): only checks that the def is the one the registry was built from, a def that
+    # is replaced on the config is picked up at once, one changed in place at the next get_function_registry call
+    function_def = getattr(config, function_def_name)
+    registry = _registries.get(id(function_def))
+    if (registry is None) or (registry.function_def is not function_def):
+        registry = get_function_registry(config, function_def_name)
+    return registry.functions
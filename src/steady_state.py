@@ -0,0 +1,173 @@
+from typing import Any, Dict, Callable
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from genome import DefaultGenome
+import random
+import time
+import os
+
+
+class SteadyStateEvolution(object):
+    # no generations: every finished evaluation breeds one new child, so workers never wait for the slowest genome
+    def __init__(self, config: object, fitness_function: Callable[[DefaultGenome], float], population_size: int,
+                 num_workers: int = None, tournament_size: int = 3):
+        # fitness_function and the genomes are sent to the worker processes, so they have to be picklable
+        assert population_size >= 2, 'population_size must be at least 2'
+        self.config = config
+        self.fitness_function = fitness_function
+        self.population_size = population_size
+        self.num_workers = num_workers
+        self.tournament_size = tournament_size
+        self.genome_type = getattr(config, 'genome_type', DefaultGenome)
+        self.population: Dict[Any, DefaultGenome] = {}
+        self.best_genome: DefaultGenome = None
+        self.evaluations: int = 0
+        self.elapsed: float = 0.
+        self._next_key: int = 0
+
+    @property
+    def evaluations_per_second(self) -> float:
+        return self.evaluations / self.elapsed if self.elapsed > 0 else 0.
+
+    def _new_key(self) -> int:
+        key = self._next_key
+        self._next_key += 1
+        return key
+
+    def _select(self) -> DefaultGenome:
+        candidates = random.sample(list(self.population.values()), min(self.tournament_size, len(self.population)))
+        return max(candidates, key=lambda g: g.fitness)
+
+    def create_genome(self) -> DefaultGenome:
+        genome = self.genome_type(self._new_key())
+        genome.configure_new(self.config)
+        genome.mutate(self.config)
+        return genome
+
+    def breed(self) -> DefaultGenome:
+        if len(self.population) < 2:
+            return self.create_genome()
+        parent1 = self._select()
+        parent2 = self._select()
+        child = self.genome_type(self._new_key())
+        child.configure_crossover(parent1, parent2, self.config)
+        child.mutate(self.config)
+        return child
+
+    def _insert(self, genome: DefaultGenome) -> None:
+        if (self.best_genome is None) or (genome.fitness > self.best_genome.fitness):
+            self.best_genome = genome
+        self.population[genome.key] = genome
+        if len(self.population) > self.population_size:
+            # replace the worst member, which may be the new genome itself
+            worst_key = min(self.population, key=lambda gk: self.population[gk].fitness)
+            del self.population[worst_key]
+
+    def run(self, max_evaluations: int, fitness_threshold: float = None) -> DefaultGenome:
+        start = time.perf_counter()
+        num_workers = self.num_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            in_flight: Dict[Future, DefaultGenome] = {}
+            submitted = 0
+            # keep every worker busy plus one queued task each, so a worker never waits for the parent process
+            max_in_flight = 2 * num_workers
+
+            def submit(genome: DefaultGenome) -> None:
+                nonlocal submitted
+                in_flight[executor.submit(self.fitness_function, genome)] = genome
+                submitted += 1
+
+            while (submitted < max_evaluations) and (len(in_flight) < max_in_flight):
+                submit(self.create_genome() if submitted < self.population_size else self.breed())
+            while len(in_flight) > 0:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    genome = in_flight.pop(future)
+                    genome.fitness = float(future.result())
+                    self.evaluations += 1
+                    self._insert(genome)
+                if (fitness_threshold is not None) and (self.best_genome.fitness >= fitness_threshold):
+                    for future in in_flight:
+                        future.cancel()
+                    break
+                while (submitted < max_evaluations) and (len(in_flight) < max_in_flight):
+                    submit(self.create_genome() if submitted < self.population_size else self.breed())
+        self.elapsed += time.perf_counter() - start
+        return self.best_genome
+
+
+def _demo_fitness(genome: DefaultGenome) -> float:
+    # evaluation time varies 10x between genomes
+    time.sleep(random.uniform(0.01, 0.1))
+    return -sum(abs(cg.weight - 1.) for cg in genome.connections.values()) - abs(len(genome.connections) - 4)
+
+
+if __name__ == '__main__':
+    from genes import NeuralNodeGene, NeuralConnectionGene
+    import activation_functions
+    import aggregation_functions
+
+    class Config(object):
+        node_gene_type = NeuralNodeGene
+        connection_gene_type = NeuralConnectionGene
+        genome_type = DefaultGenome
+        input_keys = [-1, -2]
+        output_keys = [0]
+        add_node_mutation_prob = 0.2
+        del_node_mutation_prob = 0.05
+        add_connection_mutation_prob = 0.5
+        del_connection_mutation_prob = 0.1
+
+        weight_init_type = 'normal'
+        weight_mean = 0.0
+        weight_stdev = 1.0
+        weight_max_value = 2.0
+        weight_min_value = -2.0
+        weight_mutation_power = 0.5
+        weight_mutation_rate = 0.6
+        weight_replace_rate = 0.1
+        enabled_mutation_rate = 0.01
+
+        response_init_type = 'normal'
+        response_mean = 0.0
+        response_stdev = 1.0
+        response_max_value = 2.0
+        response_min_value = -2.0
+        response_mutation_power = 0.5
+        response_mutation_rate = 0.6
+        response_replace_rate = 0.1
+
+        bias_init_type = 'normal'
+        bias_mean = 0.0
+        bias_stdev = 1.0
+        bias_max_value = 2.0
+        bias_min_value = -2.0
+        bias_mutation_power = 0.5
+        bias_mutation_rate = 0.6
+        bias_replace_rate = 0.1
+
+        activation_mutation_rate = 0.1
+        activation_value_mutation_rate = {'sigmoid': 0.5, 'tanh': 0.5}
+        aggregation_mutation_rate = 0.1
+        aggregation_value_mutation_rate = {'sum': 0.5, 'mean': 0.5}
+
+        activation_function_def = {
+            'sigmoid': activation_functions.SigmoidActivationFunction,
+            'tanh': activation_functions.TanhActivationFunction
+        }
+        aggregation_function_def = {
+            'sum': aggregation_functions.SumAggregationFunction,
+            'mean': aggregation_functions.MeanAggregationFunction
+        }
+
+    evolution = SteadyStateEvolution(Config(), _demo_fitness, population_size=20, num_workers=4)
+    best = evolution.run(max_evaluations=400)
+    print('steady-state: {0} evaluations, {1:.1f} evaluations/s, best fitness {2:.3f}'.format(
+        evolution.evaluations, evolution.evaluations_per_second, best.fitness))
+
+    # generational baseline: each batch of 20 waits for its slowest genome
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        for _ in range(20):
+            population = [evolution.create_genome() for _ in range(20)]
+            list(executor.map(_demo_fitness, population))
+    print('generational: 400 evaluations, {0:.1f} evaluations/s'.format(400 / (time.perf_counter() - start)))